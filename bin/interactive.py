@@ -2,12 +2,9 @@ from odmf.config import conf
 from odmf.tools import Path
 from odmf import db
 import pandas as pd
-import os
-import time
 import numpy as np
 import time
 import contextlib
-import time
 import logging
 logging.basicConfig(
     level=logging.INFO,
@@ -16,10 +13,12 @@ logging.basicConfig(
 
 @contextlib.contextmanager
 def timeit(name='action'):
-    tstart = time.time()
-    yield
-    d = time.time() - tstart
-    print(f'------------ {name} took {d:0.3f} seconds')
+    tstart = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        d = time.perf_counter_ns() - tstart
+        print(f'------------ {name} took {d / 1e9:0.3f} seconds')
 
 session: db.orm.Session = db.Session()
 
@@ -41,6 +40,8 @@ greeting = """
 
     Get dataset with id=1
     >>>ds_one = ds[1]
+    Get several datasets with a single query
+    >>>ds_list = ds[1, 2, 3]
     Query sites:
     >>>site.q.filter(db.Site.lat > 50.5).count()        
     """
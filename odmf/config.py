@@ -38,6 +38,10 @@ class Configuration:
     """
     datetime_default_timezone = 'Europe/Berlin'
     database_url = 'sqlite://'
+    # Connection pool settings for server databases (not used for sqlite)
+    database_pool = {'pool_size': 10, 'max_overflow': 20, 'pool_pre_ping': True, 'pool_recycle': 1800}
+    # Number of compiled SQL statements cached by the engine
+    database_query_cache_size = 1024
     static = [prefix]
     media_image_path = 'webpage/media'
     nav_background = '/media/gladbacherhof.jpg'
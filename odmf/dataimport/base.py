@@ -5,6 +5,9 @@ Created on 07.02.2013
 '''
 import sys
 from datetime import datetime, timedelta
+from functools import lru_cache
+from math import inf
+from contextlib import contextmanager
 from glob import glob
 from odmf.tools import Path
 import os.path as op
@@ -12,6 +15,7 @@ import os
 from configparser import RawConfigParser
 from io import StringIO
 import typing
+import numpy as np
 from charset_normalizer import detect
 
 import ast
@@ -24,24 +28,55 @@ logger = getLogger(__name__)
 
 
 
-def findStartDate(siteid, instrumentid):
+@contextmanager
+def _use_session(session=None):
+    """
+    Yields the given session or, if None, a new transactional session scope
+    """
+    from .. import db
+    if session is None:
+        with db.session_scope() as session:
+            yield session
+    else:
+        yield session
+
+
+@lru_cache()
+def _start_date_statement():
+    """
+    Builds the statement for findStartDate once, the ids are bound on execution
+    """
+    from .. import db
+    return db.sql.select(db.Dataset.end).where(
+        db.Dataset._site == db.sql.bindparam('site'),
+        db.Dataset._source == db.sql.bindparam('instrument')
+    ).order_by(db.Dataset.end.desc()).limit(1)
+
+
+def findStartDate(siteid, instrumentid, session=None):
     """
     Looks for a site / instrument combination the end of the last existing timeseries
+
+    :param session: An open session to reuse, eg. for a whole import run. If None, a new session is used
     :return:
     """
-    from .. import db
+    with _use_session(session) as session:
+        return session.scalar(_start_date_statement(), dict(site=siteid, instrument=instrumentid))
 
-    with db.session_scope() as session:
-        ds = session.query(db.Dataset).filter(db.Dataset._site == siteid,
-                                              db.Dataset._source == instrumentid)\
-            .order_by(db.Dataset.end.desc()).first()
-        if ds:
-            return ds.end
-        else:
-            return None
 
+def _filter_gaps(rows, mingap=np.timedelta64(1, 'D')):
+    """
+    Returns the (prev_end, start) pairs of rows, where start - prev_end >= mingap
+    """
+    if not rows:
+        return []
+    # Transpose the rows in C instead of indexing each row in Python
+    prev_ends, starts = (np.array(col, dtype='datetime64[us]') for col in zip(*rows))
+    mask = (starts - prev_ends) >= mingap
+    return list(zip(prev_ends[mask].tolist(), starts[mask].tolist()))
 
-def finddateGaps(siteid, instrumentid, valuetype, startdate=None, enddate=None):
+
+def finddateGaps(siteid, instrumentid, valuetype, startdate=None, enddate=None, session=None):
     """
 
     Find gaps in with given params
@@ -51,6 +86,7 @@ def finddateGaps(siteid, instrumentid, valuetype, startdate=None, enddate=None):
     :param valuetype:
     :param startdate:
     :param enddate:
+    :param session: An open session to reuse, eg. for a whole import run. If None, a new session is used
     :return:
     """
     from .. import db
@@ -58,75 +94,117 @@ def finddateGaps(siteid, instrumentid, valuetype, startdate=None, enddate=None):
     logger.info("finddateGaps - START")
     logger.info("finddateGaps - valutype(s) list=%s" % valuetype)
 
-    with db.session_scope() as session:
-
-        dss = session.query(db.Dataset) \
-            .filter(db.Dataset._site == siteid,
-                    db.Dataset._source == instrumentid,
-                    db.Dataset._valuetype.in_(valuetype)) \
-            .order_by(db.Dataset._valuetype, db.Dataset.start)
+    def no_datasets():
+        # There is no data. Allow full upload
+        if startdate and enddate:
+            logger.info("finddateGaps - Full upload allowed / %s %s /" % (startdate, enddate))
+            return [(startdate, enddate)]
+        else:
+            logger.info("finddateGaps - No datasets")
+            return None
 
-        logger.info("finddateGaps - %d rows after query" % dss.count())
+    # Without valuetypes there are no datasets to look for
+    if not valuetype:
+        return no_datasets()
+
+    func = db.sql.func
+    ds = db.Dataset
+    in_period = [ds._site == siteid, ds._source == instrumentid, ds._valuetype.in_(valuetype)]
+    # Filter for datasets which are in our period
+    if startdate:
+        in_period.append(ds.end > startdate)
+    if enddate:
+        in_period.append(ds.start < enddate)
+
+    # A single query: For each dataset the first valuetype of the period, the boundaries of its
+    # valuetype and the end of its predecessor. Without type_, SQLite returns prev_end as a string
+    by_vt = dict(partition_by=ds._valuetype)
+    windowed = db.sql.select(
+        ds._valuetype.label('valuetype'),
+        func.min(ds._valuetype).over().label('first_vt'),
+        func.min(ds.start).over(**by_vt).label('first_start'),
+        func.max(ds.end).over(**by_vt).label('last_end'),
+        func.lag(ds.end, type_=ds.end.type).over(order_by=ds.start, **by_vt).label('prev_end'),
+        ds.start.label('start'),
+    ).where(*in_period).subquery()
+    w = windowed.c
+    # Only the first valuetype is used to find the gaps
+    stmt = db.sql.select(w.first_vt, w.first_start, w.last_end, w.prev_end, w.start)\
+        .where(w.valuetype == w.first_vt)\
+        .order_by(w.start)
+    in_sql = db.engine.dialect.name == 'postgresql'
+    if in_sql:
+        # The first dataset (without predecessor) carries the boundaries, the others are returned for gaps only
+        stmt = stmt.where(w.prev_end.is_(None) | (w.start - w.prev_end >= timedelta(days=1)))
+
+    with _use_session(session) as session:
+        rows = session.execute(stmt).all()
+
+    # Check if their are datasets in our period
+    if not rows:
+        return no_datasets()
+
+    first_vt, first_start, last_end = rows[0][:3]
+    logger.info("finddateGaps - valuetype=%s (start=%s, end=%s)" % (first_vt, startdate, enddate))
+    gaps = [(row.prev_end, row.start) for row in rows if row.prev_end is not None]
+    if not in_sql:
+        # Date arithmetic is not portable, eg. for SQLite, compare vectorized in NumPy
+        gaps = _filter_gaps(gaps)
+
+    # Make start and enddate if not present
+    if not startdate:
+        logger.info("finddateGaps - Create startdate at %s" % first_start)
+        startdate = first_start
+    if not enddate:
+        logger.info("finddateGaps - Create enddate at %s" % last_end)
+        enddate = last_end
+
+    # Start search
+    res = []
+
+    # Is there space before the first dataset?
+    if startdate < first_start:
+        logger.info("finddateGaps - Append %s - %s - v:%s" %
+              (startdate, first_start, first_vt))
+        res.append((startdate, first_start))
+
+    # Gaps>1 day between datasets
+    logger.info("finddateGaps - Append %d gaps between datasets - v:%s" % (len(gaps), first_vt))
+    res.extend(tuple(g) for g in gaps)
+
+    # Is there space after the last dataset
+    if enddate > last_end:
+        logger.info("finddateGaps - Append %s - %s - v:%s" %
+              (last_end, enddate, first_vt))
+        res.append((last_end, enddate))
+
+    logger.info("finddateGaps - Returning %d gap(s)" % len(res))
+    return res
+
+
+def write_records(conn, df, chunksize=1000):
+    """
+    Appends a dataframe in the record table format (dataset, id, time, value [,sample, comment, is_error])
+    to the record table.
 
-        if dss.count() != 0:
-            # Filter for datasets which are in our period
-            if startdate:
-                dss = dss.filter(db.Dataset.end > startdate)
-                logger.info("finddateGaps - %d rows after startdatefilter %s" %
-                      (dss.count(), startdate))
-            else:
-                logger.info("finddateGaps - No startdate")
-            if enddate:
-                dss = dss.filter(db.Dataset.start < enddate)
-                logger.info("finddateGaps - %d rows after enddatefilter %s" %
-                      (dss.count(), enddate))
-            else:
-                logger.info("finddateGaps - No enddate")
-
-        # Check if their are datasets in our period
-        if dss is None or dss.count() == 0:
-            # There is no data. Allow full upload
-            if startdate and enddate:
-                logger.info("finddateGaps - Full upload allowed / ",
-                      startdate, " ", enddate, " /")
-                return [(startdate, enddate)]
-            else:
-                logger.info("finddateGaps - No datasets")
-                return None
+    On PostgreSQL with psycopg2 the frame is streamed as CSV via COPY FROM STDIN, which
+    skips the per value parameter handling of INSERT. Other databases use DataFrame.to_sql
 
-        # Make start and enddate if not present
-        if not startdate:
-            logger.info("finddateGaps - Create startdate at ", dss[0].start)
-            startdate = dss[0].start
-        if not enddate:
-            logger.info("finddateGaps - Create enddate at ", dss[-1].end)
-            enddate = dss[-1].end
-
-        # Start search
-        res = []
-
-        # Is there space before the first dataset?
-        if startdate < dss[0].start:
-            logger.info("finddateGaps - Append %s - %s - v:%s" %
-                  (startdate, dss[0].start, dss[0].valuetype))
-            res.append((startdate, dss[0].start))
-
-        # Check for gaps>1 day between datasets
-        for ds1, ds2 in zip(dss[:-1], dss[1:]):
-            # if there is a gap between
-            if ds2.start - ds1.end >= timedelta(days=1):
-                logger.info("finddateGaps - Append %s - %s - v:%s - v:%s" %
-                      (ds1.end, ds2.start, ds1.valuetype, ds2.valuetype))
-                res.append((ds1.end, ds2.start))
-
-        # Is there space after the last dataset
-        if enddate > dss[-1].end:
-            logger.info("finddateGaps - Append %s - %s - v:%s" %
-                  (dss[-1].end, enddate, dss[-1].valuetype))
-            res.append((dss[-1].end, enddate))
-
-        logger.info("finddateGaps - Returning %d gap(s)" % len(res))
-        return res
+    :param conn: The connection to use, eg. session.connection()
+    :param df: The records
+    :param chunksize: Rows per INSERT statement for to_sql
+    :return: The number of written records
+    """
+    if conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2':
+        buf = StringIO()
+        df.to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        columns = ', '.join(f'"{c}"' for c in df.columns)
+        with conn.connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY record ({columns}) FROM STDIN WITH CSV', buf)
+    else:
+        df.to_sql('record', conn, if_exists='append', index=False, method='multi', chunksize=chunksize)
+    return len(df)
 
 
 class ImportColumn:
@@ -553,16 +631,62 @@ class ImportDescription(object):
 
 
 class ImportStat(object):
-    def __init__(self, sum=0.0, min=1e308, max=-1e308, n=0, start=datetime(2100, 1, 1), end=datetime(1900, 1, 1)):
+    __slots__ = ('sum', 'min', 'max', 'n', 'start', 'end')
+
+    def __init__(self, sum=0.0, min=inf, max=-inf, n=0, start=datetime.max, end=datetime.min):
         self.sum, self.min, self.max, self.n, self.start, self.end = sum, min, max, n, start, end
 
+    @property
+    def empty(self) -> bool:
+        """True, if no value has been added yet"""
+        return self.n == 0
+
     @property
     def mean(self):
+        if self.empty:
+            raise ValueError("empty")
         return self.sum / float(self.n)
 
+    def update(self, value: float, time: datetime):
+        """
+        Adds a single value measured at time to the statistics
+        """
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.n += 1
+        self.start = min(self.start, time)
+        self.end = max(self.end, time)
+
+    def update_array(self, values: np.ndarray, times: np.ndarray):
+        """
+        Adds an array of values with the (sorted) times of measurement to the statistics
+        """
+        if not len(values):
+            return
+        values = np.asarray(values)
+        # datetime64[us].item() converts to datetime.datetime
+        times = np.asarray(times, dtype='datetime64[us]')
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.n += values.size
+        self.start = min(self.start, times[0].item())
+        self.end = max(self.end, times[-1].item())
+
+    def merge(self, other: 'ImportStat') -> 'ImportStat':
+        """
+        Combines two statistics, eg. from different chunks of an import, to a new statistic
+        """
+        return type(self)(
+            sum=self.sum + other.sum,
+            min=min(self.min, other.min), max=max(self.max, other.max),
+            n=self.n + other.n,
+            start=min(self.start, other.start), end=max(self.end, other.end)
+        )
+
     def __str__(self):
-        d = self.__dict__
-        d.update({'mean': self.mean})
+        d = self.__jsondict__()
         return """Statistics:
         mean    = %(mean)g
         min/max = %(min)g/%(max)g
@@ -572,9 +696,7 @@ class ImportStat(object):
         """ % d
 
     def __repr__(self):
-        d = self.__dict__
-        d.update({'mean': self.mean})
-        return repr(d)
+        return repr(self.__jsondict__())
 
     def __jsondict__(self):
         return dict(mean=self.mean, min=self.min, max=self.max, n=self.n, start=self.start, end=self.end)
@@ -1,5 +1,5 @@
 
-from .base import ImportDescription, ImportColumn
+from .base import ImportDescription, ImportColumn, write_records
 import typing
 from .. import db
 import pandas as pd
@@ -409,7 +409,6 @@ def submit(session: db.Session, idescr: ImportDescription, filepath: Path, user:
     recordframe = _get_recordframe(session, idescr, datasets, df)
     logger.info(f'insert {len(recordframe)} records into {len(recordframe.dataset.unique())} datasets')
 
-    conn = session.connection()
-    recordframe.to_sql('record', conn, if_exists='append', index=False, method='multi', chunksize=1000)
+    write_records(session.connection(), recordframe)
 
     return messages
@@ -5,5 +5,5 @@ from .project import Project
 from .site import Site, Datasource, Log, Installation
 from .job import Job
 from .dataset import Dataset, DatasetGroup, Quality, ValueType, removedataset
-from .timeseries import Timeseries, MemRecord, Record
+from .timeseries import Timeseries, MemRecord, Record, record_insert_statement
 from .transformed_timeseries import TransformedTimeseries
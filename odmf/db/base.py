@@ -8,8 +8,9 @@ Created on 13.02.2012
 
 import sqlalchemy as sql
 import sqlalchemy.orm as orm
+import typing
 from contextlib import contextmanager
-from functools import total_ordering
+from functools import total_ordering, lru_cache
 
 from ..config import conf
 
@@ -33,9 +34,14 @@ def get_session_class():
         from sqlalchemy.pool import StaticPool
         engine = sql.create_engine(conf.database_url,
                                connect_args={'check_same_thread': False},
-                               poolclass=StaticPool)
+                               poolclass=StaticPool,
+                               query_cache_size=conf.database_query_cache_size)
     else:
-        engine = sql.create_engine(conf.database_url)
+        options = dict(conf.database_pool or {})
+        if sql.engine.make_url(conf.database_url).get_dialect().driver == 'psycopg2':
+            # Send executemany INSERTs as multi-row VALUES and other statements in batches
+            options.setdefault('executemany_mode', 'values_plus_batch')
+        engine = sql.create_engine(conf.database_url, query_cache_size=conf.database_query_cache_size, **options)
     # Try to connect to engine
     with engine.connect():
         ...
@@ -73,21 +79,23 @@ def table(obj) -> sql.Table:
 class Base(object):
     """Hooks into SQLAlchemy's magic to make :meth:`__repr__`s."""
 
-    def __repr__(self):
-        def reprs():
-            for col in table(self).c:
-                try:
-                    yield col.name, str(getattr(self, col.name))
-                except Exception as e:
-                    yield col.name, f'<unknown value: {type(e)}>'
+    @classmethod
+    def _repr_columns(cls) -> typing.Tuple[str, ...]:
+        """Returns the column names of the class, cached per class"""
+        if (cols := cls.__dict__.get('_repr_column_names')) is None:
+            cols = tuple(col.name for col in table(cls).c)
+            cls._repr_column_names = cols
+        return cols
 
-        def formats(seq):
-            for key, value in seq:
-                yield f'{key}={value}'
+    def __repr__(self):
+        def value(name):
+            try:
+                return str(getattr(self, name))
+            except Exception as e:
+                return f'<unknown value: {type(e)}>'
 
-        args = ', '.join(formats(reprs()))
-        classy = type(self).__name__
-        return f'{classy}({args})'
+        args = ', '.join([f'{name}={value(name)}' for name in self._repr_columns()])
+        return f'{type(self).__name__}({args})'
 
     def __lt__(self, other):
         if isinstance(other, type(self)) and hasattr(self, 'id'):
@@ -126,6 +134,18 @@ def stringcol():
     return sql.Column(sql.String)
 
 
+@lru_cache()
+def _batch_statement(cls: type) -> typing.Tuple[sql.Select, str]:
+    """
+    Returns a prebuilt statement to load objects of cls by a list of primary keys (bind parameter 'keys')
+    and the name of the primary key attribute. Only for classes with a single column primary key
+    """
+    mapper = sql.inspect(cls)
+    (pk,) = mapper.primary_key
+    stmt = sql.select(cls).where(pk.in_(sql.bindparam('keys', expanding=True)))
+    return stmt, mapper.get_property_by_column(pk).key
+
+
 class ObjectGetter:
     """
     A helper class for interactive environments for simple access to orm-objects
@@ -134,6 +154,7 @@ class ObjectGetter:
 
     >>> ds = ObjectGetter(db.Dataset, session)
     >>> print(ds[10])
+    >>> print(ds[10, 11, 12])
     >>> ds.q.filter_by(measured_by='philipp')
     """
     def __init__(self, cls: type, session: orm.Session, **filter):
@@ -148,12 +169,42 @@ class ObjectGetter:
     def q(self) -> orm.Query:
         return self.session.query(self.cls).filter_by(**self.filter)
 
+    @property
+    def composite(self) -> bool:
+        """True, if the primary key of the class has more than one column"""
+        return len(sql.inspect(self.cls).primary_key) > 1
+
     def __getitem__(self, item):
+        if isinstance(item, list) or (isinstance(item, tuple) and not self.composite):
+            return self(*item)
         if (res:=self.session.get(self.cls, item)) is not None:
             return res
         else:
             raise KeyError(f'{item} not found in {self.cls}')
 
+    def __call__(self, *items):
+        """
+        Loads many objects by primary key with a single IN query
+        and returns them in the order of the given keys
+
+        >>> ds(1, 2, 3)
+        >>> ds[[1, 2, 3]]
+
+        For composite primary keys each item is a tuple of the key columns,
+        these objects are loaded one by one
+        """
+        if self.composite:
+            return [self[item] for item in items]
+        stmt, attr = _batch_statement(self.cls)
+        keys = set(items)
+        found = {
+            getattr(obj, attr): obj
+            for obj in self.session.scalars(stmt, {'keys': list(keys)})
+        }
+        if missing := keys - found.keys():
+            raise KeyError(f'{sorted(missing)} not found in {self.cls}')
+        return [found[item] for item in items]
+
 
     def __repr__(self):
         return 'ObjectGetter(' + self.cls.__name__ + ')'
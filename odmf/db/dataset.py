@@ -150,13 +150,21 @@ class Dataset(Base):
     __mapper_args__ = dict(polymorphic_identity=None,
                            polymorphic_on=type)
 
+    __table_args__ = (
+        # Used to find the last dataset of an instrument at a site, a btree can be scanned backwards for end DESC
+        sql.Index('dataset-site-source-end-index', 'site', 'source', 'end'),
+        # Used for the gap search of imports (dataimport.base.finddateGaps)
+        sql.Index('dataset-site-source-valuetype-start-index', 'site', 'source', 'valuetype', 'start'),
+    )
+
 
 
     def __str__(self):
-        site = self.site.id if self.site else ''
+        # Use the foreign key column to avoid loading the site. Only unflushed datasets need the relationship
+        site = self._site if self._site is not None else (self.site.id if self.site else '')
         level = f'{self.level:g} m offset' if self.level is not None else ''
         return (f'ds{self.id or -999:04d}: {self.valuetype} at #{site} {level} with {self.source} '
-                f'({self.start or "?"} - {self.end or "?"})').replace("'", r"\'")
+                f'({self.start or "?"} - {self.end or "?"})')
 
     def __jdict__(self):
         return dict(id=self.id,
@@ -170,7 +178,7 @@ class Dataset(Base):
                     quality=self.quality,
                     level=self.level,
                     comment=self.comment,
-                    label=self.__str__(),
+                    label=str(self).replace("'", r"\'"),
                     access=self.access)
 
     def is_timeseries(self):
@@ -307,17 +315,18 @@ class Dataset(Base):
 def removedataset(*args):
     """Removes a dataset and its records entirely from the database
     !!Handle with care, there will be no more checking!!"""
+    from .timeseries import Record
     with session_scope() as session:
-        datasets = [session.get(Dataset, int(a)) for a in args]
+        ids = [int(a) for a in args]
+        datasets = [session.get(Dataset, dsid) for dsid in ids]
+        # Delete the records of all datasets with one statement
+        reccount = session.execute(
+            sql.delete(Record).where(Record._dataset.in_(ids)).execution_options(synchronize_session=False)
+        ).rowcount
+        # Datasets are deleted by the ORM, to take care of the subclass tables
         for ds in datasets:
-            dsid = ds.id
-            if ds.is_timeseries():
-                reccount = ds.records.delete()
-                session.commit()
-            else:
-                reccount = 0
             session.delete(ds)
-            logger.info(f"Deleted ds{dsid:04d} and {reccount} records")
+        logger.info(f"Deleted {len(datasets)} datasets ({', '.join(f'ds{i:04d}' for i in ids)}) and {reccount} records")
 
 
 class DatasetGroup(object):
@@ -331,10 +340,13 @@ class DatasetGroup(object):
 
     def asseries(self, session, name=None):
         datasets = self.datasets(session)
-        data = pd.concat([
+        parts = [
             src.asseries(self.start, self.end)
             for src in datasets
-        ])
+        ]
+        if not parts:
+            return pd.Series([], index=pd.to_datetime([]), dtype=float, name=name)
+        data = pd.concat(parts)
         data.name = name
         return data.sort_index()
 
@@ -9,6 +9,8 @@ Created on 10.02.2012
 
 from math import pi, sin, cos, tan, sqrt
 
+import numpy as np
+
 # LatLong- UTM conversion..h
 # definitions for lat/long to UTM and UTM to lat/lng conversions
 # include <string.h>
@@ -69,46 +71,57 @@ def LLtoUTM(ReferenceEllipsoid, Lat, Long):
     North latitudes are positive, South latitudes are negative
     Lat and Long are in decimal degrees
     Written by Chuck Gantz- chuck.gantz@globalstar.com
+
+    The calculation is done by LLtoUTM_array
+    """
+    ZoneNumber, UTMEasting, UTMNorthing = LLtoUTM_array(ReferenceEllipsoid, Lat, Long)
+
+    # compute the UTM Zone from the latitude and longitude
+    UTMZone = "%d%c" % (int(ZoneNumber), _UTMLetterDesignator(Lat))
+    return (UTMZone, float(UTMEasting), float(UTMNorthing))
+
+
+def LLtoUTM_array(ReferenceEllipsoid, Lat, Long):
+    """
+    converts numpy arrays of latitudes and longitudes in decimal degrees to UTM coords,
+    with the equations described in LLtoUTM. Returns the zone numbers (without letter) as an int array
+    :return: ZoneNumber, UTMEasting, UTMNorthing
     """
+    Lat = np.asarray(Lat, dtype=float)
+    Long = np.asarray(Long, dtype=float)
     a = _ellipsoid[ReferenceEllipsoid][_EquatorialRadius]
     eccSquared = _ellipsoid[ReferenceEllipsoid][_eccentricitySquared]
     k0 = 0.9996
 
-    # Make sure the longitude is between -180.00 .. 179.9
-    LongTemp = (Long + 180) - int((Long + 180) / 360) * \
-        360 - 180  # -180.00 .. 179.9
+    # Make sure the longitude is between -180.00 .. 179.9, int() truncates towards zero
+    LongTemp = (Long + 180) - np.trunc((Long + 180) / 360) * 360 - 180
 
     LatRad = Lat * _deg2rad
     LongRad = LongTemp * _deg2rad
 
-    ZoneNumber = int((LongTemp + 180) / 6) + 1
-
-    if Lat >= 56.0 and Lat < 64.0 and LongTemp >= 3.0 and LongTemp < 12.0:
-        ZoneNumber = 32
+    ZoneNumber = np.trunc((LongTemp + 180) / 6).astype(int) + 1
+    ZoneNumber = np.where((Lat >= 56.0) & (Lat < 64.0) & (LongTemp >= 3.0) & (LongTemp < 12.0), 32, ZoneNumber)
 
     # Special zones for Svalbard
-    if Lat >= 72.0 and Lat < 84.0:
-        if LongTemp >= 0.0 and LongTemp < 9.0:
-            ZoneNumber = 31
-        elif LongTemp >= 9.0 and LongTemp < 21.0:
-            ZoneNumber = 33
-        elif LongTemp >= 21.0 and LongTemp < 33.0:
-            ZoneNumber = 35
-        elif LongTemp >= 33.0 and LongTemp < 42.0:
-            ZoneNumber = 37
+    svalbard = (Lat >= 72.0) & (Lat < 84.0)
+    ZoneNumber = np.select(
+        [svalbard & (LongTemp >= 0.0) & (LongTemp < 9.0),
+         svalbard & (LongTemp >= 9.0) & (LongTemp < 21.0),
+         svalbard & (LongTemp >= 21.0) & (LongTemp < 33.0),
+         svalbard & (LongTemp >= 33.0) & (LongTemp < 42.0)],
+        [31, 33, 35, 37],
+        ZoneNumber
+    )
 
     # +3 puts origin in middle of zone
     LongOrigin = (ZoneNumber - 1) * 6 - 180 + 3
     LongOriginRad = LongOrigin * _deg2rad
 
-    # compute the UTM Zone from the latitude and longitude
-    UTMZone = "%d%c" % (ZoneNumber, _UTMLetterDesignator(Lat))
-
     eccPrimeSquared = (eccSquared) / (1 - eccSquared)
-    N = a / sqrt(1 - eccSquared * sin(LatRad) * sin(LatRad))
-    T = tan(LatRad) * tan(LatRad)
-    C = eccPrimeSquared * cos(LatRad) * cos(LatRad)
-    A = cos(LatRad) * (LongRad - LongOriginRad)
+    N = a / np.sqrt(1 - eccSquared * np.sin(LatRad) * np.sin(LatRad))
+    T = np.tan(LatRad) * np.tan(LatRad)
+    C = eccPrimeSquared * np.cos(LatRad) * np.cos(LatRad)
+    A = np.cos(LatRad) * (LongRad - LongOriginRad)
 
     M = a * ((1
               - eccSquared / 4
@@ -116,26 +129,25 @@ def LLtoUTM(ReferenceEllipsoid, Lat, Long):
               - 5 * eccSquared * eccSquared * eccSquared / 256) * LatRad
              - (3 * eccSquared / 8
                 + 3 * eccSquared * eccSquared / 32
-                + 45 * eccSquared * eccSquared * eccSquared / 1024) * sin(2 * LatRad)
+                + 45 * eccSquared * eccSquared * eccSquared / 1024) * np.sin(2 * LatRad)
              + (15 * eccSquared * eccSquared / 256 + 45 * eccSquared *
-                eccSquared * eccSquared / 1024) * sin(4 * LatRad)
-             - (35 * eccSquared * eccSquared * eccSquared / 3072) * sin(6 * LatRad))
+                eccSquared * eccSquared / 1024) * np.sin(4 * LatRad)
+             - (35 * eccSquared * eccSquared * eccSquared / 3072) * np.sin(6 * LatRad))
 
     UTMEasting = (k0 * N * (A + (1 - T + C) * A * A * A / 6
                             + (5 - 18 * T + T * T + 72 * C - 58 * eccPrimeSquared) * A * A * A * A * A / 120)
                   + 500000.0)
 
-    UTMNorthing = (k0 * (M + N * tan(LatRad) * (A * A / 2 + (5 - T + 9 * C + 4 * C * C) * A * A * A * A / 24
-                                                + (61
-                                                   - 58 * T
-                                                   + T * T
-                                                   + 600 * C
-                                                   - 330 * eccPrimeSquared) * A * A * A * A * A * A / 720)))
-
-    if Lat < 0:
-        # 10000000 meter offset for southern hemisphere
-        UTMNorthing = UTMNorthing + 10000000.0
-    return (UTMZone, UTMEasting, UTMNorthing)
+    UTMNorthing = (k0 * (M + N * np.tan(LatRad) * (A * A / 2 + (5 - T + 9 * C + 4 * C * C) * A * A * A * A / 24
+                                                   + (61
+                                                      - 58 * T
+                                                      + T * T
+                                                      + 600 * C
+                                                      - 330 * eccPrimeSquared) * A * A * A * A * A * A / 720)))
+
+    # 10000000 meter offset for southern hemisphere
+    UTMNorthing = np.where(Lat < 0, UTMNorthing + 10000000.0, UTMNorthing)
+    return ZoneNumber, UTMEasting, UTMNorthing
 
 
 def _UTMLetterDesignator(Lat):
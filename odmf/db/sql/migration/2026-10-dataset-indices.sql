@@ -0,0 +1,9 @@
+create index if not exists "dataset-site-source-end-index" on dataset (site, source, "end");
+create index if not exists "dataset-site-source-valuetype-start-index" on dataset (site, source, valuetype, start);
+create index if not exists "record-dataset-id-index" on record (dataset, id);
+drop index if exists "record-dataset-time-index";
+create index "record-dataset-time-index" on record (dataset, time) include (value, is_error);
+-- The single column index is covered by the indices above. Its name depends on how the database was created:
+-- "record-dataset-index" from the ORM models, record_dataset_index from tables/record.sql
+drop index if exists "record-dataset-index";
+drop index if exists record_dataset_index;
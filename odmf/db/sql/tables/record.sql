@@ -86,14 +86,14 @@ ALTER TABLE ONLY record
 -- Name: record-dataset-time-index; Type: INDEX; Schema: public; Owner: schwingbach-user; Tablespace: 
 --
 
-CREATE INDEX "record-dataset-time-index" ON record USING btree (dataset, "time" DESC);
+CREATE INDEX "record-dataset-time-index" ON record USING btree (dataset, "time") INCLUDE (value, is_error);
 
 
 --
--- Name: record_dataset_index; Type: INDEX; Schema: public; Owner: schwingbach-user; Tablespace: 
+-- Name: record-dataset-id-index; Type: INDEX; Schema: public; Owner: schwingbach-user; Tablespace: 
 --
 
-CREATE INDEX record_dataset_index ON record USING btree (dataset);
+CREATE INDEX "record-dataset-id-index" ON record USING btree (dataset, id);
 
 
 --
@@ -1,6 +1,7 @@
 import sqlalchemy as sql
 import sqlalchemy.orm as orm
 from datetime import datetime
+from functools import lru_cache
 import typing
 import numpy as np
 import pandas as pd
@@ -13,6 +14,8 @@ logger = getLogger(__name__)
 
 
 class MemRecord(object):
+    __slots__ = ('id', 'dataset', 'time', 'value', 'sample', 'comment', 'is_error', 'rawvalue')
+
     def __init__(self, id, dataset, time, value, sample=None, comment=None, is_error=False, rawvalue=None):
         self.id = id
         self.dataset = dataset
@@ -23,6 +26,10 @@ class MemRecord(object):
         self.is_error = is_error
         self.rawvalue = rawvalue
 
+    def __jdict__(self):
+        # Without a __dict__, the default json handler needs this
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'dataset'} | dict(dataset=self.dataset.id)
+
 
 class Record(Base):
     """
@@ -55,8 +62,10 @@ class Record(Base):
     censorcode = 'nc'
 
     __table_args__ = (
-        sql.Index('record-dataset-time-index', 'dataset', 'time'),
-        sql.Index('record-dataset-index', 'dataset')
+        # Covering index for asseries, allows index-only scans on PostgreSQL
+        sql.Index('record-dataset-time-index', 'dataset', 'time', postgresql_include=['value', 'is_error']),
+        # The primary key starts with id and can not serve MAX(id) for a dataset
+        sql.Index('record-dataset-id-index', 'dataset', 'id'),
     )
 
     @property
@@ -72,7 +81,12 @@ class Record(Base):
 
     @classmethod
     def query(cls, session):
-        return session.query(cls).select_from(Timeseries).join(Timeseries.records)
+        # Fill the dataset from the existing join, load the valuetype and source used by __str__ for all datasets at once
+        return session.query(cls).select_from(Timeseries).join(Timeseries.records).options(
+            orm.contains_eager(cls.dataset).options(
+                orm.selectinload(Timeseries.valuetype), orm.selectinload(Timeseries.source)
+            )
+        )
 
     def __jdict__(self):
         return dict(id=self.id,
@@ -83,6 +97,48 @@ class Record(Base):
                     comment=self.comment)
 
 
+def series_statistics(s: pd.Series):
+    """
+    Returns mean, stddev and n of the valid values of a series (or array).
+    Works on the plain float array, avoiding the pandas dispatch of np.mean / np.std on a Series
+    """
+    values = np.asarray(s, dtype=float)
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return 0.0, 0.0, 0
+    return float(values.mean()), float(values.std()), int(values.size)
+
+
+@lru_cache()
+def _max_id_statement():
+    """The statement for maxrecordid, built once. The dataset is bound as dsid"""
+    return sql.select(sql.func.max(Record.id)).where(Record._dataset == sql.bindparam('dsid'))
+
+
+@lru_cache()
+def _neighbours_statement():
+    """
+    The statement for findvalue, built once: The next and the last valid record
+    of the dataset dsid around time, labeled by side
+    """
+    valid = (Record._dataset == sql.bindparam('dsid'), Record.value.isnot(None), ~Record.is_error)
+    time = sql.bindparam('time', type_=sql.DateTime)
+    return sql.union_all(
+        sql.select(
+            sql.literal('next').label('side'), Record.time, Record.value
+        ).where(Record.time >= time, *valid).order_by(Record.time).limit(1).subquery().select(),
+        sql.select(
+            sql.literal('last').label('side'), Record.time, Record.value
+        ).where(Record.time <= time, *valid).order_by(sql.desc(Record.time)).limit(1).subquery().select()
+    )
+
+
+@lru_cache()
+def record_insert_statement():
+    """The INSERT statement for plain record rows (dicts with the column names as keys), built once"""
+    return Record.__table__.insert()
+
+
 class Timeseries(Dataset):
     __mapper_args__ = dict(polymorphic_identity='timeseries')
     # records: orm.Query
@@ -119,27 +175,28 @@ class Timeseries(Dataset):
         Return simple statistical description of the timeseries
         :return: mean, stddev, n
         """
-        try:  # Try to use sql functions
-            f = sql.sql.func
+        session = self.session()
+        if session.bind.dialect.name == 'sqlite':
+            # SQLite has no stddev_samp. Failing statements would also break the transaction on other databases
+            return series_statistics(self.asseries())
+        try:  # Try to use sql functions, a single aggregate over the valid records
+            f = sql.func
             rv = Record.value
-            q = self.session().query(
+            q = sql.select(
                 f.avg(rv), f.stddev_samp(rv), f.count(rv)
-            ).filter_by(_dataset=self.id)
-            avg, std, n = q.first()
+            ).where(Record._dataset == self.id, ~Record.is_error)
+            avg, std, n = session.execute(q).one()
             avg = avg or 0.0
             std = std or 0.0
+            slope, offset = self.calibration_slope, self.calibration_offset
             return (
-                avg * self.calibration_slope + self.calibration_offset,
-                std * self.calibration_slope,
+                avg * slope + offset,
+                std * abs(slope),
                 n
             )
 
         except (sql.exc.ProgrammingError, sql.exc.OperationalError):
-            s = self.asseries()
-            if len(s) == 0:
-                return 0.0, 0.0, 0
-            else:
-                return np.mean(s), np.std(s), len(s)
+            return series_statistics(self.asseries())
 
     def findjumps(self, threshold, start=None, end=None):
         """Returns an iterator to find all jumps greater than threshold
@@ -150,19 +207,24 @@ class Timeseries(Dataset):
         """
         records = self.records.order_by(Record.time).filter(Record.value.isnot(None), ~Record.is_error).filter(
             Record.time >= (start or self.start)).filter(Record.time <= (end or self.end))
-        last = None
-        for rec in records:
-            if rec.value is not None:
-                if threshold == 0.0 or (last and abs(rec.value - last.value) > threshold):
-                    yield rec
-                last = rec
+        if threshold == 0.0:
+            yield from records
+            return
+
+        # The database compares each value with the previous one and returns only the jump records
+        valid = records.with_entities(
+            Record.id,
+            (Record.value - sql.func.lag(Record.value).over(order_by=Record.time)).label('diff')
+        ).order_by(None).subquery()
+        jump_ids = sql.select(valid.c.id).where(sql.func.abs(valid.c.diff) > threshold)
+        yield from records.filter(Record.id.in_(jump_ids))
 
     def findvalue(self, time):
         """Finds the linear interpolated value for the given time in the record"""
-        next = self.records.filter(
-            Record.time >= time, Record.value.isnot(None), ~Record.is_error).order_by(Record.time).first()
-        last = self.records.filter(
-            Record.time <= time, Record.value.isnot(None), ~Record.is_error).order_by(sql.desc(Record.time)).first()
+        # Get the next and the last record with a single query
+        neighbours = self.session().execute(_neighbours_statement(), dict(dsid=self.id, time=time))
+        rows = {row.side: row for row in neighbours}
+        next, last = rows.get('next'), rows.get('last')
         if next and last:
             dt_next = (next.time - time).total_seconds()
             dt_last = (time - last.time).total_seconds()
@@ -188,20 +250,9 @@ class Timeseries(Dataset):
 
     def maxrecordid(self):
         """Finds the highest record id for this dataset"""
-
-        # Heavily optimized code for large record tables and an asc-Index of id for the record table
-        # See issue #99
-        #
-        size = self.size()
-        sess = self.session()
-
-        # query = self.records.order_by(Record.id).offset(size - 1)
-        if size:
-            query = sess.query(Record.id).filter_by(_dataset=self.id).order_by(Record.id).offset(size - 1)
-            max_id = query.scalar()
-            return max_id or 0
-        else:
-            return 0
+        # MAX(id) is answered from the tip of "record-dataset-id-index", see issue #99
+        max_id = self.session().scalar(_max_id_statement(), dict(dsid=self.id))
+        return max_id or 0
 
     def addrecord(self, Id=None, value=None, time=None, comment=None, sample=None, out_of_timescope_ok=False):
         """Adds a record to the dataset
@@ -247,24 +298,35 @@ class Timeseries(Dataset):
         self.end = max(Q(sql.func.max(Record.time)).filter_by(_dataset=self.id).scalar(), self.end)
 
     def size(self):
-        return self.records.count()
-
-    def iterrecords(self, witherrors=False, start=None, end=None):
-        session = self.session()
-        records = session.query(Record).filter(
-            Record._dataset == self.id).order_by(Record.time)
+        # A plain COUNT on the dataset column, answered from "record-dataset-id-index".
+        # records.count() wraps the full record query in a subquery
+        return self.session().scalar(
+            sql.select(sql.func.count()).select_from(Record).where(Record._dataset == self.id)
+        )
+
+    def _records_select(self, witherrors=False, start=None, end=None):
+        """Core select of the plain record columns of this dataset, ordered by time"""
+        records = sql.select(
+            Record.id, Record.time, Record.value, Record.sample, Record.comment, Record.is_error
+        ).where(Record._dataset == self.id)
         if start:
-            records = records.filter(Record.time >= start)
+            records = records.where(Record.time >= start)
         if end:
-            records = records.filter(Record.time <= end)
-        records = records.order_by(Record.time)
+            records = records.where(Record.time <= end)
         if not witherrors:
-            records = records.filter(~Record.is_error)
-        for r in records:
-            yield MemRecord(id=r.id, dataset=r.dataset,
-                            time=r.time, value=r.calibrated,
-                            sample=r.sample, comment=r.comment,
-                            rawvalue=r.value, is_error=r.is_error)
+            records = records.where(~Record.is_error)
+        return records.order_by(Record.time)
+
+    def iterrecords(self, witherrors=False, start=None, end=None):
+        session = self.session()
+        # Load plain rows instead of Record objects, the dataset is self anyway
+        records = self._records_select(witherrors, start, end).execution_options(yield_per=10000)
+        slope, offset = self.calibration_slope, self.calibration_offset
+        for id, time, value, sample, comment, is_error in session.execute(records):
+            yield MemRecord(id=id, dataset=self,
+                            time=time, value=None if value is None else value * slope + offset,
+                            sample=sample, comment=comment,
+                            rawvalue=value, is_error=is_error)
 
     def asseries(self, start: typing.Optional[datetime] = None, end: typing.Optional[datetime] = None, with_errors=False)->pd.Series:
         """
@@ -273,24 +335,27 @@ class Timeseries(Dataset):
         :param end: An end time for the series
         """
         query = self.session().query
-        records = query(Record.time, Record.value).filter_by(_dataset=self.id)
+        # The database calibrates the values
+        calibrated = Record.value * self.calibration_slope + self.calibration_offset
+        records = query(Record.time, calibrated.label('value')).filter_by(_dataset=self.id)
         if not with_errors:
             records = records.filter(~Record.is_error)
         if start:
             records = records.filter(Record.time >= start)
         if end:
             records = records.filter(Record.time <= end)
+        # Sort by time ascending, using the index
+        records = records.order_by(Record.time)
 
-        # Load data from database into dataframe and get the value-Series
-        values = pd.read_sql(records.statement, self.session().bind, index_col='time')['value']
+        # Stream the data from a server side cursor into dataframe chunks and get the value-Series
+        statement = records.statement.execution_options(stream_results=True)
+        chunks = [
+            chunk['value']
+            for chunk in pd.read_sql(statement, self.session().bind, index_col='time', chunksize=100_000)
+        ]
 
         # If no data is present, ensure the right dtype for the empty series
-        if values.empty:
+        if not chunks or all(chunk.empty for chunk in chunks):
             return pd.Series([], index=pd.to_datetime([]), dtype=float)
 
-        # Sort by time ascending
-        values.sort_index(inplace=True)
-        # Do calibration
-        values *= self.calibration_slope
-        values += self.calibration_offset
-        return values
+        return chunks[0] if len(chunks) == 1 else pd.concat(chunks)
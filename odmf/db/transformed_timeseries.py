@@ -3,11 +3,11 @@ import sqlalchemy.orm as orm
 from sqlalchemy.schema import ForeignKey
 from .base import Base, newid
 from .dataset import Dataset
-from .timeseries import Timeseries, Record, MemRecord
+from .timeseries import Timeseries, Record, MemRecord, series_statistics
 
+import ast
 import numpy as np
 import pandas as pd
-from asteval import Interpreter
 
 from logging import getLogger
 logger = getLogger(__name__)
@@ -21,57 +21,88 @@ class TransformedTimeseries(Dataset):
     expression = sql.Column(sql.String)
     latex = sql.Column(sql.String)
 
-    # An asteval interpreter with minimal functionality
-    interpreter = Interpreter(minimal=True, max_statement_length=300)
-
     def sourceids(self):
         return [s.id for s in self.sources]
 
     def size(self):
-        return self.session().query(Record).filter(Record._dataset.in_(self.sourceids())).count()
+        return self.session().scalar(
+            sql.select(sql.func.count()).select_from(Record).where(Record._dataset.in_(self.sourceids()))
+        )
 
     def asseries(self, start=None, end=None):
         datasets = self.sources
-        data = []
         if self.expression.startswith('plugin.transformation'):
             # This is a plugin transformation
             # import transformation module
-            pass
-        else:
-            for src in datasets:
-                v = src.asseries(start, end)
-                v = self.transform(v)
-                data.append(v)
-
-            data = pd.concat(data).sort_index()
-        return data
+            return []
+        parts = [src.asseries(start, end) for src in datasets]
+        if not parts:
+            return pd.Series([], index=pd.to_datetime([]), dtype=float, name=str(self))
+        # Transform all sources at once
+        return self.transform(pd.concat(parts).sort_index())
 
     def updatetime(self):
         self.start = min(ds.start for ds in self.sources)
         self.end = max(ds.end for ds in self.sources)
 
+    def _compiled_expression(self):
+        """
+        Returns an asteval interpreter of this object and the parsed expression.
+
+        The expression is only parsed again if it has changed. Each object uses its own interpreter
+        with minimal functionality, to keep the symbol table 'x' separated
+        """
+        expression = self.expression.strip()
+        cache = getattr(self, '_expression_cache', None)
+        if cache is None or cache[0] != expression:
+            # asteval is only needed, when something gets transformed
+            from asteval import Interpreter
+            interpreter = Interpreter(minimal=True, max_statement_length=300)
+            cache = self._expression_cache = expression, interpreter, interpreter.parse(expression)
+        return cache[1], cache[2]
+
     def transform(self, x: pd.Series):
-        self.interpreter.symtable['x'] = x.to_numpy()
-        result = self.interpreter(self.expression.strip())
-        return pd.Series(result, index=x.index, name=str(self))
+        """
+        Applies the expression to x, which can be a Series, an array or a single value
+        """
+        interpreter, parsed = self._compiled_expression()
+        is_series = isinstance(x, pd.Series)
+        interpreter.symtable['x'] = x.to_numpy() if is_series else x
+        # eval resets the errors of the previous call, a failed transformation does not stick
+        result = interpreter.eval(parsed)
+        if is_series:
+            return pd.Series(result, index=x.index, name=str(self))
+        else:
+            return result
 
     def iterrecords(self, witherrors=False, start=None, end=None):
         session = self.session()
-        srcrecords = session.query(Record).filter(
-            Record._dataset.in_(self.sourceids())).order_by(Record.time)
+        # The source datasets with their calibration, loaded once instead of per record
+        sources = {
+            src.id: (src, src.calibration_slope, src.calibration_offset)
+            for src in self.sources
+        }
+        srcrecords = sql.select(
+            Record._dataset, Record.time, Record.value, Record.sample, Record.comment, Record.is_error
+        ).where(Record._dataset.in_(list(sources))).order_by(Record.time)
         if start:
-            srcrecords = srcrecords.filter(Record.time >= start)
+            srcrecords = srcrecords.where(Record.time >= start)
         if end:
-            srcrecords = srcrecords.filter(Record.time <= end)
+            srcrecords = srcrecords.where(Record.time <= end)
         if not witherrors:
-            srcrecords = srcrecords.filter(~Record.is_error)
-        i = 0
-        for r in srcrecords:
-            i += 1
-            yield MemRecord(id=i, dataset=r.dataset, time=r.time,
-                            value=self.transform(r.calibrated),
-                            sample=r.sample, comment=r.comment,
-                            is_error=r.is_error)
+            srcrecords = srcrecords.where(~Record.is_error)
+        rows = session.execute(srcrecords).all()
+        if not rows:
+            return
+        # Calibrate and transform all values at once
+        calibration = np.array([sources[row[0]][1:] for row in rows], dtype=float)
+        values = np.array([row[2] for row in rows], dtype=float)
+        values = np.broadcast_to(self.transform(values * calibration[:, 0] + calibration[:, 1]), len(rows))
+        for i, ((dsid, time, _, sample, comment, is_error), value) in enumerate(zip(rows, values), start=1):
+            yield MemRecord(id=i, dataset=sources[dsid][0], time=time,
+                            value=value,
+                            sample=sample, comment=comment,
+                            is_error=is_error)
 
     def suitablesources(self):
         session = self.session()
@@ -84,12 +115,92 @@ class TransformedTimeseries(Dataset):
             res = res.filter(Timeseries.valuetype == vt)
         return res
 
+    def affine_coefficients(self):
+        """
+        Returns (a, b), if the expression is a linear function a * x + b of x, else None
+        """
+        if self.expression.startswith('plugin.transformation'):
+            return None
+        try:
+            tree = ast.parse(self.expression.strip(), mode='eval')
+        except SyntaxError:
+            return None
+        return _affine(tree.body)
+
     def statistics(self):
-        s = self.asseries()
-        if len(s) == 0:
+        coefficients = self.affine_coefficients()
+        if coefficients:
+            return self._affine_statistics(*coefficients)
+        return series_statistics(self.asseries())
+
+    def _affine_statistics(self, a, b):
+        """
+        Calculates mean, stddev and n of a linear transformation from per source aggregates in the database.
+        Each source value v becomes a * (slope * v + offset) + b
+
+        The database returns the mean and the centred sum of squares of each source, these are
+        combined with the parallel variance algorithm (Chan et al.), which does not cancel out
+        for a large mean with a small spread
+        """
+        session = self.session()
+        f = sql.func
+        valid = [Record._dataset.in_(self.sourceids()), ~Record.is_error, Record.value.isnot(None)]
+        means = sql.select(
+            Record._dataset.label('dataset'), f.count(Record.value).label('n'), f.avg(Record.value).label('mean')
+        ).where(*valid).group_by(Record._dataset).subquery()
+        deviation = Record.value - means.c.mean
+        moments = sql.select(
+            means.c.dataset, means.c.n, means.c.mean, f.sum(deviation * deviation)
+        ).join_from(Record, means, Record._dataset == means.c.dataset).where(*valid).group_by(
+            means.c.dataset, means.c.n, means.c.mean
+        )
+        sources = {src.id: src for src in self.sources}
+        n, mean, m2 = 0, 0.0, 0.0
+        for dsid, count, src_mean, src_m2 in session.execute(moments):
+            if not count:
+                continue
+            src = sources[dsid]
+            slope = a * src.calibration_slope
+            offset = a * src.calibration_offset + b
+            # Mean and centred sum of squares of the transformed source values
+            src_mean = slope * float(src_mean) + offset
+            src_m2 = slope * slope * float(src_m2 or 0.0)
+            total = n + count
+            delta = src_mean - mean
+            mean += delta * count / total
+            m2 += src_m2 + delta * delta * n * count / total
+            n = total
+        if not n:
             return 0.0, 0.0, 0
-        else:
-            return np.mean(s), np.std(s), len(s)
+        return mean, np.sqrt(max(m2 / n, 0.0)), int(n)
+
+
+def _affine(node):
+    """
+    Returns the coefficients (a, b) of an expression tree a * x + b, None for other expressions
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return 0.0, float(node.value)
+    elif isinstance(node, ast.Name) and node.id == 'x':
+        return 1.0, 0.0
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _affine(node.operand)
+        if operand and isinstance(node.op, ast.USub):
+            return -operand[0], -operand[1]
+        return operand
+    elif isinstance(node, ast.BinOp):
+        left, right = _affine(node.left), _affine(node.right)
+        if not (left and right):
+            return None
+        if isinstance(node.op, ast.Add):
+            return left[0] + right[0], left[1] + right[1]
+        elif isinstance(node.op, ast.Sub):
+            return left[0] - right[0], left[1] - right[1]
+        elif isinstance(node.op, ast.Mult) and (left[0] == 0 or right[0] == 0):
+            return left[0] * right[1] + right[0] * left[1], left[1] * right[1]
+        elif isinstance(node.op, ast.Div) and right[0] == 0 and right[1] != 0:
+            return left[0] / right[1], left[1] / right[1]
+    return None
 
 
 transforms_table = sql.Table(
@@ -211,6 +211,8 @@ def interactive():
         
         Get dataset with id=1
         >>>ds_one = ds[1]
+        Get several datasets with a single query
+        >>>ds_list = ds[1, 2, 3]
         Query sites:
         >>>site.q.filter(db.Site.lat > 50.5).count()        
         """)
@@ -42,14 +42,23 @@ class Calibration:
         self.matches = []
         if target and source:
             sourcerecords = self.source.records(self.target.session())
+            target_tz = self.target.tzinfo
+            # timezone and calibration of the source datasets, looked up once per dataset and not per record
+            datasets = {}
             for sr in sourcerecords:
+                if sr._dataset not in datasets:
+                    ds = sr.dataset
+                    datasets[sr._dataset] = ds.tzinfo, ds.calibration_slope, ds.calibration_offset
+                source_tz, slope, offset = datasets[sr._dataset]
                 # Change the time of source record from source timezone to the target timezone
-                time = sr.time - \
-                    sr.dataset.tzinfo.utcoffset(
-                        sr.time) + self.target.tzinfo.utcoffset(sr.time)
+                if source_tz is target_tz:
+                    time = sr.time
+                else:
+                    time = sr.time - source_tz.utcoffset(sr.time) + target_tz.utcoffset(sr.time)
                 tv, dt = target.findvalue(time)
                 if dt <= limit:
-                    self.matches.append(Match(sr.time, tv, sr.calibrated, dt))
+                    calibrated = None if sr.value is None else slope * sr.value + offset
+                    self.matches.append(Match(sr.time, tv, calibrated, dt))
         self.slope = 1.0
         self.offset = 0.0
         self.meanoffset = 0.0
@@ -5,12 +5,16 @@ Imports parquet file in the record table format into the database, perfoming a c
 Philipp Kraft 2022-06-23
 """
 import logging
+import typing
 import pandas as pd
 from odmf import db
 
 logger = logging.getLogger(__name__)
 
 
+RECORD_COLUMNS = ['dataset', 'id', 'time', 'value', 'sample', 'comment', 'is_error']
+
+
 def _adjust_columns(df: pd.DataFrame):
     """
     Adds and removes columns of the DataFrame df to fit with record table format
@@ -28,7 +32,7 @@ def _adjust_columns(df: pd.DataFrame):
 
     # remove unused columns
     for c in list(df.columns):
-        if c not in ['dataset', 'id', 'time', 'value', 'sample', 'comment', 'is_error']:
+        if c not in RECORD_COLUMNS:
             del df[c]
 
 
@@ -45,36 +49,45 @@ def _check_datasets(df, session):
     return list(datasets)
 
 
-def _adjust_id(df: pd.DataFrame, ds: db.Dataset):
+def _max_record_ids(session, ds_ids):
     """
-    Adjusts the record-id to fit to existing records
+    Returns the highest record id of each dataset in ds_ids with a single query, 0 for datasets without records
     """
-    maxrecordid = ds.maxrecordid() + 1
-    old_min_id = df.loc[df['dataset'] == ds.id, 'id'].min()
-    logger.info('ds:', ds.id, '.maxrecordid() = ', maxrecordid, ' old min(id) =', old_min_id)
-    if old_min_id <= maxrecordid:
-        offset = maxrecordid - old_min_id
-        logger.info(offset, ' offset')
-        df.loc[df['dataset'] == ds.id, 'id'] += offset
-        logger.info(df.loc[df['dataset'] == ds.id, 'id'].min(), 'new min(id)')
+    query = session.query(db.Record._dataset, db.sql.func.max(db.Record.id)).filter(
+        db.Record._dataset.in_(ds_ids)
+    ).group_by(db.Record._dataset)
+    return {dsid: 0 for dsid in ds_ids} | {dsid: max_id or 0 for dsid, max_id in query}
 
 
-def _adjust_time(df: pd.DataFrame, ds: db.Dataset):
+def _adjust_ids_and_times(df: pd.DataFrame, datasets: typing.List[db.Dataset], session):
     """
-    Sets the new start and end of the datasets
+    Adjusts the record-ids to fit to existing records and sets the new start and end of the datasets
     """
-    ds.start = min(ds.start, df.loc[df.dataset == ds.id, 'time'].min().to_pydatetime())
-    ds.end = max(ds.end, df.loc[df.dataset == ds.id, 'time'].max().to_pydatetime())
+    agg = df.groupby('dataset').agg(tmin=('time', 'min'), tmax=('time', 'max'), imin=('id', 'min'))
+    first_free_id = pd.Series(_max_record_ids(session, [ds.id for ds in datasets])) + 1
+    # Shift the ids of a dataset, if they overlap with existing records
+    offset = (first_free_id.reindex(agg.index) - agg.imin).clip(lower=0)
+    logger.info('record id offsets: %s', offset.to_dict())
+    df['id'] += df['dataset'].map(offset).to_numpy(dtype=df['id'].dtype)
+    for ds in datasets:
+        tmin = agg.at[ds.id, 'tmin'].to_pydatetime()
+        tmax = agg.at[ds.id, 'tmax'].to_pydatetime()
+        ds.start = min(ds.start or tmin, tmin)
+        ds.end = max(ds.end or tmax, tmax)
+
 
 def addrecords_dataframe(df: pd.DataFrame):
     """
     Adds records from a dataframe to the database
-    :param df: The dataframe in record table format
+    :param df: The dataframe in record table format. df is adjusted in place: rows without value are
+               removed, columns are added or removed and the ids are shifted to fit the existing records
     :return:
     """
     from ..webpage.auth import users
 
-    df = df[~df.value.isna()]
+    # Rows from parquet files are already filtered, skip the scan if nothing is missing
+    if df.value.hasnans:
+        df.dropna(subset=['value'], inplace=True)
     _adjust_columns(df)
 
     with db.session_scope() as session:
@@ -82,7 +95,7 @@ def addrecords_dataframe(df: pd.DataFrame):
         # Check datasets
         ds_ids = _check_datasets(df, session)
 
-        datasets = session.query(db.Dataset).filter(db.Dataset.id.in_(ds_ids)).order_by(db.Dataset.id)
+        datasets = session.query(db.Dataset).filter(db.Dataset.id.in_(ds_ids)).order_by(db.Dataset.id).all()
 
         # Alter id and timeranges
         error_ds = [
@@ -95,21 +108,36 @@ def addrecords_dataframe(df: pd.DataFrame):
             error_ds = ', '.join(f'ds{ds.id}' for ds in error_ds)
             raise ValueError(f'{users.current} may not append to datasets {error_ds}')
 
-        for ds in datasets:
-            _adjust_id(df, ds)
-            _adjust_time(df, ds)
+        _adjust_ids_and_times(df, datasets, session)
 
         # commit to db
-        conn = session.connection()
-        df.to_sql('record', conn, if_exists='append', index=False, method='multi', chunksize=1000)
+        from ..dataimport.base import write_records
+        write_records(session.connection(), df)
         return ds_ids, len(df)
 
+def _read_parquet(source) -> pd.DataFrame:
+    """
+    Reads only the record columns of a parquet file and drops the rows without value
+    in arrow, before the table is converted to pandas
+    """
+    import pyarrow.parquet as pq
+    import pyarrow.compute as pc
+    pf = pq.ParquetFile(source)
+    columns = [c for c in pf.schema_arrow.names if c in RECORD_COLUMNS]
+    if 'id' not in columns or 'value' not in columns:
+        # The ids are taken from the index or the table is invalid, leave this to the pandas path
+        return pf.read(use_pandas_metadata=True).to_pandas()
+    table = pf.read(columns=columns)
+    table = table.filter(pc.is_valid(table['value']))
+    return table.to_pandas()
+
+
 def addrecords_parquet(filename):
     """
     Expects a table in the apache arrow format to import records to existing datasets. Expected column names:
     dataset, id, time, value [,sample, comment, is_error]
     """
-    df = pd.read_parquet(filename)
+    df = _read_parquet(filename)
     return addrecords_dataframe(df)
 
 if __name__ == '__main__':
@@ -61,6 +61,9 @@ def configure_app(autoreload=False):
     }
 
     logger.info(f"autoreload = {autoreload}")
+    from ..webpage import lib as web
+    # Check the template files for changes only while developing
+    web.render.set_reload(autoreload)
     cherrypy.config.update(server_config)
     cherrypy.config.update({
         'engine.autoreload.on': autoreload,
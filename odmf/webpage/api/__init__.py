@@ -1,4 +1,4 @@
 
 
-from .api_helper import BaseAPI, get_help, write_to_file
+from .api_helper import BaseAPI, get_help, write_to_file, etag_matches
 from .api import API
\ No newline at end of file
@@ -1,5 +1,8 @@
 import os
 import inspect
+import hashlib
+
+import cherrypy
 
 
 class BaseAPI:
@@ -62,6 +65,24 @@ def get_help(obj, url):
     return url.split('/')[-1], dict(doc=doc, http_methods=http_methods, parameters=parameters, children=children, url=url)
 
 
+def etag_matches(*key) -> bool:
+    """
+    Sets an ETag header built from key and checks it against If-None-Match of the request.
+
+    If the client has the current version, the response status is set to 304 and the caller
+    should return an empty body instead of building the response
+
+    :param key: Values that change, when the response changes
+    :return: True if the client cache is valid
+    """
+    tag = '"' + hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest() + '"'
+    cherrypy.response.headers['ETag'] = tag
+    if cherrypy.request.headers.get('If-None-Match') == tag:
+        cherrypy.response.status = 304
+        return True
+    return False
+
+
 def write_to_file(dest, src):
     """
     Write data of src (file in) into location of dest (filename)
@@ -11,7 +11,7 @@ from .. import lib as web
 from ..auth import users, expose_for, has_level, Level
 from ... import db
 from ...config import conf
-from . import BaseAPI, get_help
+from . import BaseAPI, get_help, etag_matches
 
 """
 !!!!NOTE!!!!
@@ -76,7 +76,12 @@ class DatasetAPI(BaseAPI):
             res[f'{self.url}/[n]'] = f"A dataset with the id [n]. See {self.url}/list method"
             return web.json_out(res)
         with self.get_dataset(dsid, check_access=False) as ds:
-            return web.json_out(ds)
+            # The json representation embeds the related objects, hash the body itself.
+            # This saves the transfer, not the serialization
+            body = web.json_out(ds)
+            if etag_matches(body):
+                return b''
+            return body
 
     @expose_for(Level.guest)
     @web.mime.json
@@ -85,7 +90,13 @@ class DatasetAPI(BaseAPI):
         Returns all records (uncalibrated) for a dataset as json
         """
         with self.get_dataset(dsid) as ds:
-            return web.json_out(ds.records.all())
+            # Plain rows in the layout of Record.__jdict__, without loading Record objects
+            r = db.Record
+            rows = ds.session().execute(
+                db.sql.select(r.id, r._dataset.label('dataset'), r.time, r.value, r.sample, r.comment)
+                .where(r._dataset == ds.id)
+            )
+            return web.json_out([row._asdict() for row in rows])
 
     @expose_for(Level.guest)
     def values(self, dsid, start=None, end=None):
@@ -116,13 +127,18 @@ class DatasetAPI(BaseAPI):
         web.mime.binary.set()
         start = web.parsedate(start, False)
         end = web.parsedate(end, False)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
         with self.get_dataset(dsid) as ds:
             series: pd.Series = ds.asseries(start, end)
-            df = pd.DataFrame({'value': series})
-            df.reset_index(inplace=True)
-            buf = io.BytesIO()
-            df.to_parquet(buf)
-            return buf.getvalue()
+            # Write the arrays of the series directly, without copying them into a DataFrame first
+            table = pa.table({
+                'time': pa.array(series.index.to_numpy(dtype='datetime64[ns]')),
+                'value': pa.array(series.to_numpy(dtype=float)),
+            })
+            buf = pa.BufferOutputStream()
+            pq.write_table(table, buf, compression='snappy')
+            return buf.getvalue().to_pybytes()
 
     @expose_for()
     @web.method.get
@@ -143,10 +159,13 @@ class DatasetAPI(BaseAPI):
         web.mime.json.set()
         with db.session_scope() as session:
             datasets = db.Dataset.filter(session, project, valuetype, user, site, date, instrument, type, level)
-            return web.json_out([
-                ds.id
-                for ds in datasets
-            ])
+            # The list only changes, if datasets of the result are added or removed
+            max_id, count = datasets.with_entities(db.sql.func.max(db.Dataset.id), db.sql.func.count(db.Dataset.id)).one()
+            if etag_matches(max_id, count):
+                return b''
+            # Load only the ids, sorted by the database
+            ids = session.scalars(datasets.with_entities(db.Dataset.id).order_by(db.Dataset.id).statement)
+            return web.json_out(ids.all())
     @expose_for()
     @web.method.get
     def listobj(
@@ -184,11 +203,15 @@ class DatasetAPI(BaseAPI):
         """
         with db.session_scope() as session:
             try:
-                pers = session.get(db.Person, kwargs.get('measured_by'))
-                vt = session.get(db.ValueType, kwargs.get('valuetype'))
-                q = session.get(db.Quality, kwargs.get('quality'))
-                s = session.get(db.Site, kwargs.get('site'))
-                src = session.get(db.Datasource, kwargs.get('source'))
+                def get(cls, key):
+                    # session.get answers from the identity map if possible, missing keys need no query at all
+                    return None if key in (None, '') else session.get(cls, key)
+
+                pers = get(db.Person, kwargs.get('measured_by'))
+                vt = get(db.ValueType, kwargs.get('valuetype'))
+                q = get(db.Quality, kwargs.get('quality'))
+                s = get(db.Site, kwargs.get('site'))
+                src = get(db.Datasource, kwargs.get('source'))
 
                 ds = db.Timeseries()
                 # Get properties from the keyword arguments kwargs
@@ -243,8 +266,8 @@ class DatasetAPI(BaseAPI):
         with db.session_scope() as session:
             if not (ds := session.get(db.Dataset, dsid)):
                 raise web.APIError(404, f'Dataset {dsid} not found')
-            if isinstance(ds, db.Timeseries) and ds.size():
-                raise web.APIError(500, f'Dataset ds{dsid} has {ds.size()} records. Call api.dataset.delete_records({dsid}) first, to delete all records')
+            if isinstance(ds, db.Timeseries) and (n := ds.size()):
+                raise web.APIError(500, f'Dataset ds{dsid} has {n} records. Call api.dataset.delete_records({dsid}) first, to delete all records')
             session.delete(ds)
             return web.json_out(dict(status='success', datasets=[dsid]))
 
@@ -349,19 +372,26 @@ class DatasetAPI(BaseAPI):
             data = [data]
         warnings = []
         datasets = set()
-        records = 0
+        rows = []
         with db.session_scope() as session:
-            dataset: typing.Optional[db.Timeseries] = None
+            # Load all referenced datasets with one query
+            dsids = {
+                web.conv(int, rec.get('dsid') or rec.get('dataset') or rec.get('dataset_id'))
+                for rec in data
+            }
+            loaded = {
+                ds.id: ds
+                for ds in session.query(db.Dataset).filter(db.Dataset.id.in_(dsids - {None}))
+            }
+            # The next free record id per dataset, queried once per dataset
+            next_ids = {}
             for rec in data:
-                dsid = rec.get('dsid') or rec.get('dataset') or rec.get('dataset_id')
+                dsid = web.conv(int, rec.get('dsid') or rec.get('dataset') or rec.get('dataset_id'))
                 if not dsid:
                     warnings.append(f'{rec} does not reference a valid dataset '
                                     f'(allowed keywords are dsid, dataset and dataset_id)')
-                if not dataset or dataset.id != dsid:
-                    # load dataset from db
-                    dataset = session.get(db.Dataset, dsid)
-                else:
-                    ...  # reuse last dataset
+                    continue
+                dataset = loaded.get(dsid)
                 if not dataset:
                     warnings.append(f'ds{dsid} does not exist')
                     continue
@@ -375,15 +405,19 @@ class DatasetAPI(BaseAPI):
                     warnings.append(f'{rec} has no valid value')
                 if time is None:
                     warnings.append(f'{rec} has not a valid time')
-                sample = rec.get('sample')
-                comment = rec.get('comment')
                 recid = rec.get('recid')
                 if recid is None:
-                    recid = dataset.maxrecordid() + 1
-                record = db.Record(dataset=dataset, id=recid, value=value, time=time, sample=sample, comment=comment)
-                session.add(record)
-                records += 1
+                    if dsid not in next_ids:
+                        next_ids[dsid] = dataset.maxrecordid() + 1
+                    recid = next_ids[dsid]
+                    next_ids[dsid] += 1
+                rows.append(dict(dataset=dsid, id=recid, value=value, time=time,
+                                 sample=rec.get('sample'), comment=rec.get('comment'), is_error=False))
                 datasets.add(dsid)
+            records = len(rows)
+            if rows and not warnings:
+                # One executemany INSERT for all records
+                session.execute(db.record_insert_statement(), rows)
             if not warnings:
                 session.commit()
                 return web.json_out(dict(status='success', datasets=list(datasets), records=records))
@@ -58,11 +58,12 @@ def check_auth(*args, **kwargs):
 cherrypy.tools.auth = cherrypy.Tool('before_handler', check_auth)
 
 
+_basepath = op.abspath(op.dirname(__file__))
+
+
 def abspath(fn):
     "Returns the absolute path to the relative filename fn"
-    basepath = op.abspath(op.dirname(__file__))
-    normpath = op.normpath(fn)
-    return op.join(basepath, normpath)
+    return op.join(_basepath, op.normpath(fn))
 
 
 
@@ -15,7 +15,7 @@ class PersonPage:
         with db.session_scope() as session:
             persons = session.query(db.Person).order_by(
                 db.sql.desc(db.Person.can_supervise), db.Person.surname)
-            me: db.Person = session.query(db.Person).get(users.current.name)
+            me: db.Person = session.get(db.Person, users.current.name)
             # 'guest' user can't see himself in the user list
             if users.current.name == 'guest':
                 persons = persons.filter(db.Person.access_level != 0)
@@ -111,9 +111,9 @@ class PersonPage:
     @web.method.post
     def addproject(self, username, project, level):
         with db.session_scope() as session:
-            me: db.Person = session.query(db.Person).get(users.current.name)
-            user: db.Person = session.query(db.Person).get(username)
-            project: db.Project = session.query(db.Project).get(int(project))
+            me: db.Person = session.get(db.Person, users.current.name)
+            user: db.Person = session.get(db.Person, username)
+            project: db.Project = session.get(db.Project, int(project))
             level = Level(int(level))
             if project.get_access_level(me) >= Level.admin:
                 project.add_member(user, level)
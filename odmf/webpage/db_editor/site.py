@@ -6,24 +6,45 @@ Created on 13.07.2012
 @author: philkraf
 '''
 import datetime
+from math import isfinite
 
 import cherrypy
 import pandas as pd
 import io
 from cherrypy.lib.static import serve_fileobj
 from traceback import format_exc as traceback
-from glob import glob
+import os
 import os.path as op
 import typing
+from functools import lru_cache
+from collections import defaultdict
 
 from .. import lib as web
 from ... import db
 from ..auth import expose_for, Level
-from io import BytesIO
 from ...db import projection as proj
 from ...config import conf
 
 
+@lru_cache(maxsize=1)
+def _icons_path() -> str:
+    """The location of the map icons in the static resources, looked up once"""
+    return str(conf.abspath('media/mapicons'))
+
+
+@lru_cache(maxsize=1)
+def _icons(path: str, mtime_ns: int) -> typing.Tuple[str, ...]:
+    """
+    The map icons in path. The directory modification time is part of the cache key,
+    adding or removing icons invalidates the cache
+    """
+    with os.scandir(path) as entries:
+        return tuple(sorted(
+            e.name for e in entries
+            if e.name.endswith('.png') and e.name != 'selection.png' and e.is_file()
+        ))
+
+
 @web.expose
 @web.show_in_nav_for(1, 'map-location')
 @cherrypy.popargs('siteid')
@@ -42,14 +63,17 @@ class SitePage:
 
             datasets = instruments = []
             try:
-                instruments = session.query(db.Datasource).order_by(db.Datasource.name)
+                instruments = session.scalars(db.sql.select(db.Datasource).order_by(db.Datasource.name)).all()
                 actualsite = session.get(db.Site, int(siteid))
                 if not actualsite:
                     error = f'Site #{siteid} does not exist'
                 else:
-                    datasets = actualsite.datasets.join(db.ValueType).order_by(
+                    # str(ds) in the dataset list needs the valuetype and the source of each dataset
+                    datasets = actualsite.datasets.join(db.ValueType).options(
+                        db.orm.contains_eager(db.Dataset.valuetype), db.orm.joinedload(db.Dataset.source)
+                    ).order_by(
                         db.ValueType.name, db.sql.desc(db.Dataset.end)
-                    )
+                    ).all()
             except:
                 error = traceback()
                 actualsite = None
@@ -63,7 +87,7 @@ class SitePage:
         with db.session_scope() as session:
             datasets = instruments = []
             try:
-                instruments = session.query(db.Datasource).order_by(db.Datasource.name)
+                instruments = session.scalars(db.sql.select(db.Datasource).order_by(db.Datasource.name)).all()
                 actualsite = db.Site(id=db.newid(db.Site, session),
                                      lon=web.conv(float, lon) or 8.55, lat=web.conv(float, lat) or 50.5,
                                      name=name or '<enter site name>')
@@ -86,10 +110,11 @@ class SitePage:
             try:
                 lon = web.conv(float, lon)
                 lat = web.conv(float, lat)
+                # Check the input first, the UTM conversion is only needed for projected coordinates
+                if None in (lon, lat) or not (isfinite(lon) and isfinite(lat)):
+                    raise web.redirect(f'../{siteid}', error='The site has no valid coordinates')
                 if lon > 180 or lat > 180:
                     lat, lon = proj.UTMtoLL(23, lat, lon, conf.utm_zone)
-                if None in (lon, lat):
-                    raise web.redirect(f'../{siteid}', error='The site has no coordinates')
 
                 site = session.get(db.Site, siteid)
                 if not site:
@@ -139,18 +164,19 @@ class SitePage:
     @web.mime.json
     def getinstalledinstruments(self):
         with db.session_scope() as session:
-            inst = [
-                inst for inst in session.query(db.Datasource)
-                if inst.sites.count()
-            ]
-            return web.json_out(sorted(inst))
+            # Only instruments with installations, tested by the database in one query
+            installed = db.sql.exists().where(db.Installation._instrument == db.Datasource.id)
+            inst = session.scalars(
+                db.sql.select(db.Datasource).where(installed).order_by(db.Datasource.name)
+            ).all()
+            return web.json_out(inst)
 
     @expose_for()
     @web.mime.json
     def getinstruments(self):
         with db.session_scope() as session:
-            inst = session.query(db.Datasource).all()
-            return web.json_out(sorted(inst))
+            inst = session.scalars(db.sql.select(db.Datasource).order_by(db.Datasource.name)).all()
+            return web.json_out(inst)
 
     @expose_for(Level.editor)
     @web.method.post
@@ -161,15 +187,11 @@ class SitePage:
                 date = web.parsedate(date)
                 site = session.get(db.Site, int(siteid))
                 instrument = session.get(db.Datasource, int(instrumentid))
-                pot_installations = session.query(db.Installation)
-                pot_installations = pot_installations.filter(
-                    db.Installation.instrument == instrument, db.Installation.site == site)
-                pot_installations = pot_installations.order_by(
-                    db.sql.desc(db.Installation.id))
-                if pot_installations.count():
-                    instid = pot_installations.first().id
-                else:
-                    instid = 0
+                # The highest installation id of this instrument at this site, 0 if none
+                instid = session.scalar(
+                    db.sql.select(db.sql.func.coalesce(db.sql.func.max(db.Installation.id), 0))
+                    .where(db.Installation._instrument == instrument.id, db.Installation._site == site.id)
+                )
                 inst = db.Installation(site, instrument, instid + 1, date, comment=comment)
                 session.add(inst)
 
@@ -256,7 +278,7 @@ class SitePage:
                 datasets = datasets.filter_by(_project=project)
             sites = {ds.site for ds in datasets}
         else:
-            sites = set(session.query(db.Site))
+            sites = set(session.scalars(db.sql.select(db.Site)))
 
         if instrument:
             if instrument == 'any':
@@ -371,37 +393,62 @@ class SitePage:
     @web.method.get
     def kml(self, sitefilter=None):
         with db.session_scope() as session:
-            query = session.query(db.Site)
-            if filter:
-                query = query.filter(sitefilter)
-            stream = web.render('sites.xml', sites=query.all(),
-                                actid=0, descriptor=SitePage.kml_description)
-            return stream.render('xml')
+            query = db.sql.select(db.Site)
+            if sitefilter:
+                query = query.where(sitefilter)
+            sites = session.scalars(query).all()
+            # site.logs and site.datasets are dynamic relationships and can not be eager loaded.
+            # Load them for all sites with one query each instead
+            site_ids = [site.id for site in sites]
+            logs = self._group_by_site(session.scalars(
+                db.sql.select(db.Log).options(db.orm.joinedload(db.Log.user))
+                .where(db.Log._site.in_(site_ids)).order_by(db.sql.desc(db.Log.time))
+            ))
+            datasets = self._group_by_site(session.scalars(
+                db.sql.select(db.Dataset).options(db.orm.joinedload(db.Dataset.valuetype))
+                .where(db.Dataset._site.in_(site_ids))
+            ))
+            descriptions = {site.id: SitePage.kml_description(site, logs[site.id], datasets[site.id]) for site in sites}
+            dataset_counts = {site.id: len(datasets[site.id]) for site in sites}
+            stream = web.render(
+                'sites.xml', sites=sites, actid=0,
+                descriptions=descriptions, dataset_counts=dataset_counts
+            )
+            return stream.render()
+
+    @staticmethod
+    def _group_by_site(query) -> typing.Dict[int, list]:
+        """Groups the objects of query (logs, datasets) by their site id"""
+        groups = defaultdict(list)
+        for obj in query:
+            groups[obj._site].append(obj)
+        return groups
 
     @classmethod
-    def kml_description(cls, site):
+    def kml_description(cls, site, logs=None, datasets=None):
+        """
+        Returns the html description of a site for the kml output.
+        logs and datasets can be given as preloaded lists, else the relationships of the site are used
+        """
         host = "http://fb09-pasig.umwelt.uni-giessen.de:8081"
-        text = [site.comment,
-                '<a href="%s/site/%s">edit...</a>' % (host, site.id)]
-        if site.height:
-            text.insert(0, '%0.1f m NN' % site.height)
-        text.append('<h3>Logbuch:</h3>')
-        for log in site.logs:
-            content = dict(date=web.formatdate(log.time),
-                           user=log.user, msg=log.message, host=host, id=log.id)
-            text.append(
-                '<li><a href="%(host)s/log/%(id)s">%(date)s, %(user)s: %(msg)s</a></li>' % content)
+        text = [f'{site.height:0.1f} m NN'] if site.height else []
+        text += [site.comment, f'<a href="{host}/site/{site.id}">edit...</a>', '<h3>Logbuch:</h3>']
+        text += [
+            f'<li><a href="{host}/log/{log.id}">{web.formatdate(log.time)}, {log.user}: {log.message}</a></li>'
+            for log in (site.logs if logs is None else logs)
+        ]
         text.append('<h3>Datens&auml;tze:</h3>')
-        for ds in site.datasets:
-            content = dict(id=ds.id, name=ds.name, start=web.formatdate(
-                ds.start), end=web.formatdate(ds.end), vt=ds.valuetype, host=host)
-            text.append(
-                '<li><a href="%(host)s/dataset/%(id)s">%(name)s, %(vt)s (%(start)s-%(end)s)</a></li>' % content)
+        text += [
+            f'<li><a href="{host}/dataset/{ds.id}">{ds.name}, {ds.valuetype} '
+            f'({web.formatdate(ds.start)}-{web.formatdate(ds.end)})</a></li>'
+            for ds in (site.datasets if datasets is None else datasets)
+        ]
         return '<br/>'.join(text)
 
     def geticons(self):
-        path = conf.abspath('media/mapicons')
-        return sorted(op.basename(p) for p in glob(op.join(path, '*.png')) if not op.basename(p) == 'selection.png')
+        path = _icons_path()
+        # A single stat instead of scanning the directory for each request
+        return _icons(path, os.stat(path).st_mtime_ns)
 
     @expose_for(Level.guest)
     @web.mime.json
@@ -416,18 +463,19 @@ class SitePage:
     @web.method.get
     def sites_csv(self):
         with db.session_scope() as session:
-            query = session.query(db.Site).order_by(db.Site.id)
-            st = BytesIO()
-            # TODO: Py3 encoding
-            st.write(
-                '"ID","long","lat","x_proj","y_proj","height","name","comment"\n'.encode('utf-8'))
-            for s in query:
-                c = s.comment.replace('\r', '').replace('\n', ' / ')
-                h = '%0.3f' % s.height if s.height else ''
-                Z, x, y = s.as_UTM()
-                st.write(('%s,%f,%f,%0.1f,%0.1f,%s,"%s","%s"\n' %
-                          (s.id, s.lon, s.lat, x, y, h, s.name, c)).encode('utf-8'))
-            return st.getvalue()
+            # Only the needed columns, no Site objects
+            query = db.sql.select(
+                db.Site.id, db.Site.lon, db.Site.lat, db.Site.height, db.Site.name, db.Site.comment
+            ).order_by(db.Site.id)
+            sites = session.execute(query).all()
+        # Project all sites at once
+        _, xs, ys = proj.LLtoUTM_array(23, [s.lat for s in sites], [s.lon for s in sites])
+        lines = ['"ID","long","lat","x_proj","y_proj","height","name","comment"\n']
+        for (id, lon, lat, height, name, comment), x, y in zip(sites, xs, ys):
+            c = (comment or '').replace('\r', '').replace('\n', ' / ')
+            h = '%0.3f' % height if height else ''
+            lines.append('%s,%f,%f,%0.1f,%0.1f,%s,"%s","%s"\n' % (id, lon, lat, x, y, h, name, c))
+        return ''.join(lines).encode('utf-8')
 
     @expose_for(Level.logger)
     @web.method.get
@@ -8,8 +8,14 @@ __all__ = [
 ]
 
 import cherrypy
+import math
 from urllib.parse import urlencode
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from .renderer import render, Resource, literal, escape
 from .render_tools import markdown, user
 
@@ -22,7 +28,25 @@ from .errors import AJAXError, HTTPError, APIError
 
 expose = cherrypy.expose
 
-json_in = cherrypy.tools.json_in
+
+def _orjson_processor(entity):
+    """Reads the JSON request body with orjson, like cherrypy.lib.jsontools.json_processor"""
+    if not entity.headers.get('Content-Length', ''):
+        raise cherrypy.HTTPError(411)
+    body = entity.fp.read()
+    with cherrypy.HTTPError.handle(ValueError, 400, 'Invalid JSON document'):
+        cherrypy.serving.request.json = orjson.loads(body)
+
+
+def json_in(**kwargs):
+    """
+    Decorator to parse a JSON request body into cherrypy.request.json (cherrypy.tools.json_in),
+    using orjson if it is installed
+    """
+    if orjson:
+        kwargs.setdefault('processor', _orjson_processor)
+    return cherrypy.tools.json_in(**kwargs)
+
 
 HTTPRedirect = cherrypy.HTTPRedirect
 
@@ -44,18 +68,42 @@ def redirect(url, **kwargs):
     return cherrypy.HTTPRedirect(url + '?' + qs)
 
 
+def _finite(obj):
+    """
+    Replaces NaN and infinite floats in nested lists and dicts by None, as orjson writes them as null
+    """
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    elif isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    else:
+        return obj
+
+
 def json_out(obj=None, **kwargs):
     """
     Decorator for exposed functions to convert the output into utf-8 encoded json
+
+    The output is the same with and without orjson: sorted keys, an indentation of 2
+    (the only one orjson supports) and null for NaN
     """
     mime.json.set()
     if obj is None:
         obj = kwargs
+    if orjson:
+        # orjson serializes datetimes and numpy arrays natively, the rest goes through jsonhandler
+        return orjson.dumps(
+            obj,
+            default=jsonhandler,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
     return json.dumps(
-        obj,
+        _finite(obj),
         sort_keys=True,
-        indent=4,
-        default=jsonhandler
+        indent=2,
+        default=lambda o: _finite(jsonhandler(o))
     ).encode('utf-8')
 
 
@@ -192,18 +192,30 @@ def context(**kwargs):
 
 
 class Renderer(object):
-    def __init__(self):
-        self.loader = kajiki.FileLoader(
+    def __init__(self, reload=True):
+        self.loader = self._make_loader(reload)
+        self.root = None
+
+    @staticmethod
+    def _make_loader(reload):
+        return kajiki.FileLoader(
             [str(Path(p).absolute() / 'templates')
              for p in conf.static
              if (Path(p) / 'templates').exists()
-             ]
+             ],
+            reload=reload
         )
-        self.root = None
 
     def set_root(self, root):
         self.root = root
 
+    def set_reload(self, reload: bool):
+        """
+        Sets, if changed template files are recompiled. Without reload,
+        compiled templates are kept without checking the file time on each request
+        """
+        self.loader = self._make_loader(reload)
+
     def __call__(self, template_file, **kwargs):
         """Functn data to the template specified via the
         ``@output`` decorator.ion to render the give
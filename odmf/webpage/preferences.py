@@ -10,7 +10,7 @@ import json
 from ..config import conf
 import traceback
 
-json_in = web.cherrypy.tools.json_in
+json_in = web.json_in
 
 
 class Preferences(object):
@@ -36,5 +36,8 @@ def temp_in_database(obj, session):
     session.add(obj)
     session.commit()
     yield obj
-    session.delete(obj)
-    session.commit()
+    try:
+        session.delete(obj)
+        session.commit()
+    except sqlalchemy.orm.exc.ObjectDeletedError:
+        session.rollback()
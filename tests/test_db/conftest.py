@@ -0,0 +1,2 @@
+# Fixtures used by more than one test module of this package
+from .db_fixtures import person, site1_in_db, datasource1_in_db, quality, value_type, timeseries
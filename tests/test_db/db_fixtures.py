@@ -1,6 +1,7 @@
 import datetime
 
 import pytest
+import sqlalchemy.exc
 from PIL import Image
 import random
 import string
@@ -105,3 +106,41 @@ def image(tmp_path, db, session, site1_in_db, person):
         session) as image:
         yield image
 
+
+@pytest.fixture()
+def quality(db, session):
+    with temp_in_database(
+        db.Quality(
+            id=4, name='this is a name', comment='this is a comment'
+        ),
+        session) as quality:
+        yield quality
+
+
+@pytest.fixture()
+def value_type(db, session):
+    with temp_in_database(
+        db.ValueType(
+            id=1, name='this is a name', unit='this is a unit',
+            comment='this is a comment', minvalue=0.00, maxvalue=110.20
+        ),
+            session) as value_type:
+        yield value_type
+
+
+@pytest.fixture()
+def timeseries(db, session, value_type, quality, person, datasource1_in_db, site1_in_db):
+    with temp_in_database(
+            db.Timeseries(
+                id=1, name='this is a name', filename='this is a filename',
+                start=datetime.datetime(2020, 2, 20), end=datetime.datetime(2020, 2, 21),
+                site=site1_in_db, valuetype=value_type, measured_by=person, quality=quality,
+                source=datasource1_in_db, calibration_offset=0, calibration_slope=1, comment='this is a comment',
+                level=2
+            ),
+            session) as timeseries:
+        yield timeseries
+        try:
+            timeseries.records.delete()
+        except sqlalchemy.exc.InvalidRequestError:
+            pass
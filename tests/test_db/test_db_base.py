@@ -68,4 +68,13 @@ def test_objectgetter(db, session):
     assert repr(og)
     admin = og['odmf.admin']
     assert admin.username == 'odmf.admin'
-    assert og.q.first() is admin
\ No newline at end of file
+    assert og.q.first() is admin
+
+
+def test_objectgetter_batch(db, session):
+    og = db.ObjectGetter(db.Person, session)
+    admins = og['odmf.admin', 'odmf.admin']
+    assert [a.username for a in admins] == ['odmf.admin', 'odmf.admin']
+    assert og('odmf.admin')[0] is og['odmf.admin']
+    with pytest.raises(KeyError):
+        og['odmf.admin', 'not.a.user']
@@ -7,6 +7,7 @@ import sqlalchemy.orm
 import sqlalchemy.exc
 from contextlib import contextmanager
 from tests.test_db.test_dbobjects import person, site1_in_db, datasource1_in_db
+from .db_fixtures import quality, value_type, timeseries
 from .. import conf
 
 
@@ -48,15 +49,6 @@ def temp_in_database(obj, session):
     except sqlalchemy.orm.exc.ObjectDeletedError:
         session.rollback()
 
-@pytest.fixture()
-def quality(db, session):
-    with temp_in_database(
-        db.Quality(
-            id=4, name='this is a name', comment='this is a comment'
-        ),
-        session) as quality:
-        yield quality
-
 class TestQuality:
     def test_quality(self, quality):
         assert quality
@@ -67,17 +59,6 @@ class TestQuality:
         assert 'id' in d
 
 
-@pytest.fixture()
-def value_type(db, session):
-    with temp_in_database(
-        db.ValueType(
-            id=1, name='this is a name', unit='this is a unit',
-            comment='this is a comment', minvalue=0.00, maxvalue=110.20
-        ),
-            session) as value_type:
-        yield value_type
-
-
 class TestValueType:
     def test_ValueType(self, value_type):
         assert value_type
@@ -131,24 +112,6 @@ class TestDataset:
             assert ds2.size() == 0
 
 
-@pytest.fixture()
-def timeseries(db, session, value_type, quality, person, datasource1_in_db, site1_in_db):
-    with temp_in_database(
-            db.Timeseries(
-                id=1, name='this is a name', filename='this is a filename',
-                start=datetime.datetime(2020, 2, 20), end=datetime.datetime(2020, 2, 21),
-                site=site1_in_db, valuetype=value_type, measured_by=person, quality=quality,
-                source=datasource1_in_db, calibration_offset=0, calibration_slope=1, comment='this is a comment',
-                level=2
-            ),
-            session) as timeseries:
-        yield timeseries
-        try:
-            timeseries.records.delete()
-        except sqlalchemy.exc.InvalidRequestError:
-            pass
-
-
 @pytest.fixture()
 def record(db, session, timeseries):
     with temp_in_database(
@@ -196,6 +159,17 @@ class TestTimeseriesThousandRecords:
         assert ts_df.mean() == thousand_records.value.mean()
         assert len(ts_df) == 1000
 
+    def test_timeseries_findvalue(self, timeseries, thousand_records):
+        time = datetime.datetime(2022, 1, 1, 0, 30)
+        value, dt = timeseries.findvalue(time)
+        assert value == pytest.approx(-9.9)
+        assert dt == pytest.approx(1800)
+
+    def test_timeseries_findjumps(self, timeseries, thousand_records):
+        # The timespan of the dataset starts with the second record
+        assert len(list(timeseries.findjumps(0.1))) == 998
+        assert len(list(timeseries.findjumps(0.3))) == 0
+
     def test_timeseries_statistics(self, timeseries, thousand_records):
         mean, std, n = timeseries.statistics()
         assert mean == np.mean(thousand_records.value)
@@ -225,6 +199,22 @@ class TestTimeseries:
         assert 'id' in d
         assert timeseries.records.count() == 1
 
+    def test_record_objectgetter(self, db, session, timeseries, record):
+        og = db.ObjectGetter(db.Record, session)
+        assert og[record.id, timeseries.id] is record
+        assert og[[(record.id, timeseries.id)]] == [record]
+        with pytest.raises(KeyError):
+            og[record.id + 1, timeseries.id]
+
+
+class TestTransformedTimeseries:
+
+    def test_transform_after_failure(self, db):
+        tts = db.TransformedTimeseries(expression='x + 1')
+        assert tts.transform('a') is None
+        assert tts.transform(1) == 2
+        np.testing.assert_array_equal(tts.transform(np.arange(3.0)), [1.0, 2.0, 3.0])
+
 
 class TestRemovedataset:
 
@@ -1,8 +1,9 @@
 import pytest
 import configparser
+from datetime import datetime
 
 from .. import conf
-from . import db, session
+from . import db, session, temp_in_database
 from .db_fixtures import project, person
 # Create a config file for the Odyssey Logger
 @pytest.fixture()
@@ -50,3 +51,87 @@ def test_from_file_validation(db):
     with pytest.raises(IOError) as e_info:
         base.ImportDescription.from_file(path=path, pattern=pattern)
         assert str(e_info.value) == 'Could not find .conf file for file description'
+
+
+def test_finddateGaps(db, session, timeseries):
+    from odmf.dataimport import base
+    start, end = datetime(2020, 2, 1), datetime(2020, 3, 1)
+    gaps = base.finddateGaps(timeseries._site, timeseries._source, [timeseries._valuetype], start, end)
+    assert gaps == [(start, timeseries.start), (timeseries.end, end)]
+
+
+def test_finddateGaps_no_data(db, session, timeseries):
+    from odmf.dataimport import base
+    start, end = datetime(2010, 1, 1), datetime(2010, 2, 1)
+    gaps = base.finddateGaps(timeseries._site, timeseries._source, [timeseries._valuetype], start, end)
+    assert gaps == [(start, end)]
+    assert base.finddateGaps(timeseries._site, timeseries._source, [timeseries._valuetype + 1]) is None
+
+
+@pytest.fixture()
+def later_timeseries(db, session, timeseries):
+    """
+    Two more datasets of the same site, instrument and valuetype as timeseries (2020-02-20 to 2020-02-21).
+    The first starts 4 days after timeseries, the second 12 hours after the first
+    """
+    def make(id, start, end):
+        return db.Timeseries(
+            id=id, name=f'later {id}', start=start, end=end,
+            site=timeseries.site, valuetype=timeseries.valuetype, measured_by=timeseries.measured_by,
+            quality=timeseries.quality, source=timeseries.source, calibration_offset=0, calibration_slope=1
+        )
+    with temp_in_database(make(2, datetime(2020, 2, 25), datetime(2020, 2, 26)), session) as ds2:
+        with temp_in_database(make(3, datetime(2020, 2, 26, 12), datetime(2020, 2, 27)), session) as ds3:
+            yield ds2, ds3
+
+
+def test_finddateGaps_between_datasets(db, session, timeseries, later_timeseries):
+    from odmf.dataimport import base
+    ds2, ds3 = later_timeseries
+    start, end = datetime(2020, 2, 1), datetime(2020, 3, 1)
+    gaps = base.finddateGaps(timeseries._site, timeseries._source, [timeseries._valuetype], start, end)
+    # The gap of 12 hours between ds2 and ds3 is too short to be reported
+    assert gaps == [(start, timeseries.start), (timeseries.end, ds2.start), (ds3.end, end)]
+    assert all(isinstance(t, datetime) for gap in gaps for t in gap)
+
+
+def test_finddateGaps_short_gap(db, session, timeseries, later_timeseries):
+    from odmf.dataimport import base
+    ds2, ds3 = later_timeseries
+    # Only ds2 and ds3 are in the period, they are less than a day apart
+    start, end = ds2.start, ds3.end
+    gaps = base.finddateGaps(timeseries._site, timeseries._source, [timeseries._valuetype], start, end)
+    assert gaps == []
+    # Without a period the boundaries are taken from the datasets
+    gaps = base.finddateGaps(timeseries._site, timeseries._source, [timeseries._valuetype])
+    assert gaps == [(timeseries.end, ds2.start)]
+
+
+def test_importstat_update_array():
+    import numpy as np
+    from odmf.dataimport.base import ImportStat
+    times = np.array(['2020-01-01', '2020-01-02', '2020-01-03'], dtype='datetime64[ns]')
+    stat = ImportStat()
+    stat.update_array(np.array([1.0, 2.0, 3.0]), times)
+    assert (stat.n, stat.min, stat.max, stat.mean) == (3, 1.0, 3.0, 2.0)
+    assert stat.start == datetime(2020, 1, 1)
+    assert stat.end == datetime(2020, 1, 3)
+
+    other = ImportStat()
+    other.update(5.0, datetime(2020, 1, 4))
+    merged = stat.merge(other)
+    assert (merged.n, merged.max, merged.sum) == (4, 5.0, 11.0)
+    assert merged.end == datetime(2020, 1, 4)
+    assert 'mean' in str(merged)
+    assert not hasattr(merged, '__dict__')
+
+
+def test_importstat_empty():
+    from odmf.dataimport.base import ImportStat
+    stat = ImportStat()
+    assert stat.empty
+    with pytest.raises(ValueError):
+        stat.mean
+    stat.update(1.0, datetime(2020, 1, 1))
+    assert not stat.empty
+    assert stat.mean == 1.0
@@ -3,10 +3,13 @@
 #  checks only response code
 
 import requests
+from concurrent.futures import ThreadPoolExecutor
 
 from .context import tools, conf
 from .context.tools import mail
 import re
+import functools
+import threading
 from lxml import etree
 import logging
 
@@ -38,18 +41,40 @@ endpoint_url = conf.cuahsi_wsdl_endpoint
 
 success_msg = 'TEST_WOFINTERFACE successful'
 
+# Keep-alive connections to the endpoint for all method requests
+_session = requests.Session()
+
+# lxml parsers must not be shared between threads, each request thread reuses its own
+_local = threading.local()
+
+
+def _parser():
+    """ Returns the xml parser of the current thread """
+    if not hasattr(_local, 'parser'):
+        _local.parser = etree.XMLParser(resolve_entities=False)
+    return _local.parser
+
+
+# The WSDL node listing the service methods
+_PORTTYPE_XPATH = etree.XPath('.//wsdl:portType[@name="WaterOneFlow"]',
+                              namespaces={'wsdl': 'http://schemas.xmlsoap.org/wsdl/'})
+
+# An opening tag directly followed by a closing tag, e.g. <value></value>
+_EMPTY_TAG_RE = re.compile(r'<[A-Za-z]+></[A-Za-z]')
+
 # TODO: Make this as a unit-test
 
+@functools.lru_cache(maxsize=None)
 def parse_wsdl():
     """ Returns wsdl methods """
     # Determine wsdl service methods
-    tree = etree.parse(endpoint_url)
+    tree = etree.parse(endpoint_url, _parser())
     root = tree.getroot()
 
     # Node with explicit name has methods as childs
-    #TODO: make this safe, with eg.g. iteration and string match, instead of fixed values
-    portType = root[80]
-    assert portType.attrib.get('name') == 'WaterOneFlow'
+    portTypes = _PORTTYPE_XPATH(root)
+    assert portTypes, 'No WaterOneFlow portType in the WSDL'
+    portType = portTypes[0]
 
     # scrap methods from xml node
     return [ptype.attrib.get('name') for ptype in portType]
@@ -60,7 +85,7 @@ def check_validity(xml):
     is_invalid = False
     error = None
     
-    if re.match('\<[a-zA-Z]+\>\<\/[a-zA-Z>', xml):
+    if _EMPTY_TAG_RE.search(xml):
         return True, 'Potential harvester break cause found, no empty tags'
 
     return is_invalid, error
@@ -75,18 +100,17 @@ def do_request(method_name=None):
 
     # Load SOAP xml request files
     # TODO: extend xml requests in the xml folder with boundary cases
-    files = {'file': open('wateroneflow/xml/{}-request.xml'.format(method_name.lower()), 'rb')}
-
-    r = requests.post(endpoint_url,
-                      headers=headers,
-                      files=files)
+    with open('wateroneflow/xml/{}-request.xml'.format(method_name.lower()), 'rb') as f:
+        r = _session.post(endpoint_url,
+                          headers=headers,
+                          files={'file': f})
     logger.debug('%s returned %s', method_name, r.status_code)
     
     # Parse for well formed xml
-    t = etree.XML(r.content, etree.XMLParser())
+    t = etree.fromstring(r.content, _parser())
 
     # TODO: implement additional methods for checking the xml response
-    if r.status_code is not 200:
+    if r.status_code != 200:
         # Response should be 200, if not generate error
         logger.error('%s returned %s', method_name, r.status_code)
         logger.debug('Content was \'%s\'', r.content[:30])
@@ -129,7 +153,7 @@ def if_no_errors_insert_log(errors, msg=success_msg):
     # filter None
     errors = [e for e in errors if e is not None]
 
-    if errors is []:
+    if not errors:
         logger.info(msg)
 
 
@@ -150,9 +174,10 @@ if __name__ == '__main__':
                    'The WSDL file on {} could not be fetched. Please check your HydroServerLite'.format(endpoint_url))\
             .send()
 
-    for name in methods:
-        logger.debug('Request wtih {} ...'.format(name))
-        all_errors += [do_request(method_name=name)]
+    logger.debug('Request with {} ...'.format(', '.join(methods)))
+    # The requests wait for the network, run them in parallel
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        all_errors += list(executor.map(do_request, methods))
 
     if_errors_email(all_errors, to=receivers)
 